@@ -1,10 +1,38 @@
 import os
 import signal
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass
 from pathlib import Path
-from pygdbmi.gdbcontroller import GdbController
+from pygdbmi.constants import GdbTimeoutError
 
 DEFAULT_KERNEL_PATH = "target/riscv64gc-unknown-none-elf/release/kernel"
 GDB_PORT_FILE = ".gdb-port"
+MAX_UNSOLICITED_RECORDS = 256
+NOT_RUNNING = "GDB is not running. Call gdb_connect first."
+STREAM_RECORD_TYPES = {"console", "target", "log", "output"}
+MEMORY_CACHE_SIZE = 64
+MEMORY_CACHE_TTL_SEC = 10
+# Async records after which previously read memory may no longer be valid:
+# the target ran, something wrote to memory or a register (addresses like
+# $sp are cached by expression), or a different hart or frame was selected.
+MEMORY_INVALIDATING_RECORDS = {
+    "running",
+    "stopped",
+    "memory-changed",
+    "register-changed",
+    "thread-selected",
+}
+# Breakpoints changed through the CLI, or a hit count bumped by a stop. MI does
+# not echo these for its own -break-* commands.
+BREAKPOINT_INVALIDATING_RECORDS = {
+    "breakpoint-created",
+    "breakpoint-modified",
+    "breakpoint-deleted",
+}
 
 
 def find_project_root() -> Path | None:
@@ -18,80 +46,358 @@ def find_project_root() -> Path | None:
         d = parent
 
 
+def mi_cstring(s: str) -> str:
+    escaped = s.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{escaped}"'
+
+
+# One parsed MI record. pygdbmi yields dicts; they are converted once in the
+# reader thread so the formatters can use slot access instead of dict lookups.
+@dataclass(slots=True)
+class MiRecord:
+    kind: str
+    message: str | None
+    payload: object
+    token: int | None = None
+
+
+class _Command:
+    def __init__(self, token: int, on_record: Callable[[MiRecord], None] | None = None):
+        self.token = token
+        self.on_record = on_record
+        self.responses: list[MiRecord] = []
+        self.running = False
+        self.exited = False
+        self.done = threading.Event()
+
+
+# A reader thread parses every MI record as soon as GDB prints it and hands it
+# to the command whose token it carries, so callers block on an event instead
+# of polling the pipe.
 class GDBSession:
     def __init__(self):
-        self._gdb: GdbController | None = None
+        self._gdb: subprocess.Popen | None = None
+        self._reader: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._write_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._pending: dict[int, _Command] = {}
+        self._next_token = 1
+        self._unsolicited: deque[MiRecord] = deque(maxlen=MAX_UNSOLICITED_RECORDS)
+        self._stops = 0
+        self._last_stop: MiRecord | None = None
+        self._reg_names: list[str] | None = None
+        self._mem_cache: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._bp_cache: str | None = None
 
     @property
     def connected(self) -> bool:
         if self._gdb is None:
             return False
-        if self._gdb.gdb_process is None:
-            self._gdb = None
-            return False
-        if self._gdb.gdb_process.poll() is not None:
+        if self._gdb.poll() is not None:
             self._gdb = None
             return False
         return True
 
-    def _require_gdb(self) -> GdbController:
-        if self._gdb is None:
-            raise RuntimeError("GDB is not running. Call gdb_connect first.")
-        return self._gdb
-
-    def start(self, gdb_path: str = "gdb") -> list[dict]:
+    def start(self, gdb_path: str = "gdb") -> list[MiRecord]:
         if self._gdb is not None:
             raise RuntimeError("GDB is already running.")
-        self._gdb = GdbController(
-            command=[gdb_path, "--interpreter=mi3", "--quiet"],
+        # The parser pulls in logging and regex setup; servers that only get
+        # asked for their tool list never need it.
+        from pygdbmi.gdbmiparser import parse_response
+
+        # The previous GDB may have exited on its own (see connected) without
+        # stop() ever running.
+        self._reset()
+        self._ready.clear()
+        self._gdb = subprocess.Popen(
+            [gdb_path, "--interpreter=mi3", "--quiet"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding="utf-8",
+            errors="replace",
+            bufsize=1,
+        )
+        self._reader = threading.Thread(
+            target=self._read_loop, args=(self._gdb.stdout, parse_response), daemon=True
         )
-        return self._gdb.get_gdb_response(timeout_sec=5)
+        self._reader.start()
+        if not self._ready.wait(5):
+            raise GdbTimeoutError("Did not get a prompt from gdb after 5 seconds")
+        return self.take_unsolicited()
 
     def connect_remote(
-        self, port: int, kernel_path: str = DEFAULT_KERNEL_PATH
-    ) -> list[dict]:
-        gdb = self._require_gdb()
-        responses = []
-        for cmd in [
-            "set architecture riscv:rv64",
-            "set pagination off",
-            f"set auto-load safe-path {os.getcwd()}",
-            f"file {kernel_path}",
-            f"target remote :{port}",
-        ]:
-            responses.extend(gdb.write(cmd, timeout_sec=10))
-        return responses
-
-    def execute_mi(self, command: str, timeout_sec: int = 30) -> list[dict]:
-        gdb = self._require_gdb()
-        return gdb.write(command, timeout_sec=timeout_sec)
-
-    def execute_cli(self, command: str, timeout_sec: int = 30) -> list[dict]:
-        gdb = self._require_gdb()
-        escaped = command.replace('"', '\\"')
-        return gdb.write(
-            f"-interpreter-exec console \"{escaped}\"", timeout_sec=timeout_sec
+        self, port: int, kernel_path: str = DEFAULT_KERNEL_PATH, timeout_sec: float = 30
+    ) -> list[MiRecord]:
+        *setup, names = self.execute_batch(
+            [
+                "set architecture riscv:rv64",
+                "set pagination off",
+                f"set auto-load safe-path {os.getcwd()}",
+                f"file {kernel_path}",
+                f"target remote :{port}",
+                "-data-list-register-names",
+            ],
+            timeout_sec=timeout_sec,
+        )
+        self._reg_names = None
+        for r in names:
+            if r.kind == "result" and r.message == "done":
+                self._reg_names = (r.payload or {}).get("register-names")
+        return [r for responses in setup for r in responses] + self.take_unsolicited()
+
+    @property
+    def register_names(self) -> list[str] | None:
+        return self._reg_names
+
+    def execute_mi(
+        self,
+        command: str,
+        timeout_sec: int = 30,
+        on_record: Callable[[MiRecord], None] | None = None,
+    ) -> list[MiRecord]:
+        # With on_record, stream records (console output etc.) are handed to
+        # the callback from the reader thread instead of being collected.
+        (cmd,) = self._submit([command], on_record)
+        return self._wait(cmd, timeout_sec)
+
+    def execute_batch(
+        self, commands: list[str], timeout_sec: float = 30
+    ) -> list[list[MiRecord]]:
+        # Write every command up front and drain the answers afterwards; GDB
+        # runs them in order, so the batch costs one round-trip instead of
+        # one per command.
+        deadline = time.monotonic() + timeout_sec
+        cmds = self._submit(commands)
+        try:
+            return [self._wait(cmd, max(deadline - time.monotonic(), 0)) for cmd in cmds]
+        except GdbTimeoutError:
+            with self._cond:
+                for cmd in cmds:
+                    self._pending.pop(cmd.token, None)
+            raise GdbTimeoutError(
+                f"Did not get response from gdb after {timeout_sec} seconds"
+            ) from None
+
+    def execute_cli(
+        self,
+        command: str,
+        timeout_sec: int = 30,
+        on_record: Callable[[MiRecord], None] | None = None,
+    ) -> list[MiRecord]:
+        return self.execute_mi(
+            f"-interpreter-exec console {mi_cstring(command)}",
+            timeout_sec=timeout_sec,
+            on_record=on_record,
         )
 
-    def interrupt(self):
-        gdb = self._require_gdb()
-        if gdb.gdb_process and gdb.gdb_process.pid:
-            os.kill(gdb.gdb_process.pid, signal.SIGINT)
+    def interrupt(self, timeout_sec: int = 5) -> list[MiRecord]:
+        # Wait for the resulting *stopped record, whichever command (if any)
+        # ends up consuming it.
+        gdb = self._gdb
+        if gdb is None or gdb.poll() is not None:
+            raise RuntimeError(NOT_RUNNING)
+        with self._cond:
+            stops = self._stops
+        # A no-op if GDB has exited since the poll above.
+        gdb.send_signal(signal.SIGINT)
+        with self._cond:
+            if self._cond.wait_for(lambda: self._stops != stops, timeout_sec):
+                return [self._last_stop]
+        return []
+
+    def memory_cache_get(self, key: tuple) -> object | None:
+        with self._cond:
+            entry = self._mem_cache.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > MEMORY_CACHE_TTL_SEC:
+                del self._mem_cache[key]
+                return None
+            self._mem_cache.move_to_end(key)
+            return value
+
+    def memory_cache_put(self, key: tuple, value: object):
+        with self._cond:
+            self._mem_cache[key] = (time.monotonic(), value)
+            self._mem_cache.move_to_end(key)
+            if len(self._mem_cache) > MEMORY_CACHE_SIZE:
+                self._mem_cache.popitem(last=False)
+
+    @property
+    def breakpoint_list(self) -> str | None:
+        return self._bp_cache
+
+    @breakpoint_list.setter
+    def breakpoint_list(self, value: str | None):
+        with self._cond:
+            self._bp_cache = value
+
+    def take_unsolicited(self) -> list[MiRecord]:
+        with self._cond:
+            records = list(self._unsolicited)
+            self._unsolicited.clear()
+        return records
 
     def stop(self):
         if self._gdb is not None:
             try:
-                self._gdb.exit()
+                self._gdb.terminate()
+                self._gdb.wait(timeout=5)
             except Exception:
-                pass
+                self._gdb.kill()
             self._gdb = None
+        if self._reader is not None:
+            self._reader.join(timeout=1)
+            self._reader = None
+        self._reset()
+
+    def _reset(self):
+        with self._cond:
+            self._reg_names = None
+            self._unsolicited.clear()
+            self._mem_cache.clear()
+            self._bp_cache = None
+
+    def _submit(
+        self, commands: list[str], on_record: Callable[[MiRecord], None] | None = None
+    ) -> list[_Command]:
+        gdb = self._gdb
+        if gdb is None:
+            raise RuntimeError(NOT_RUNNING)
+        with self._cond:
+            cmds = []
+            for command in commands:
+                # MI does not echo =thread-selected for its own -thread-select
+                # or -stack-select-frame.
+                if command.startswith(("-thread-select", "-stack-select-frame")):
+                    self._mem_cache.clear()
+                cmd = _Command(self._next_token, on_record)
+                self._next_token += 1
+                self._pending[cmd.token] = cmd
+                cmds.append(cmd)
+        with self._write_lock:
+            gdb.stdin.write(
+                "".join(f"{cmd.token}{c}\n" for cmd, c in zip(cmds, commands))
+            )
+            gdb.stdin.flush()
+        return cmds
 
-    @staticmethod
-    def read_gdb_port() -> int | None:
+    def _wait(self, cmd: _Command, timeout_sec: float) -> list[MiRecord]:
+        finished = cmd.done.wait(timeout_sec)
+        with self._cond:
+            if not finished:
+                self._pending.pop(cmd.token, None)
+                # The *stopped record will show up later and be picked up by
+                # interrupt().
+                if cmd.running:
+                    raise RuntimeError(
+                        f"Target still running after {timeout_sec} seconds. "
+                        "Use gdb_interrupt to stop it."
+                    )
+                raise GdbTimeoutError(
+                    f"Did not get response from gdb after {timeout_sec} seconds"
+                )
+        if cmd.exited:
+            raise RuntimeError("GDB exited while waiting for a response.")
+        return cmd.responses
+
+    def _read_loop(self, stdout, parse_response):
+        for line in stdout:
+            raw = parse_response(line.rstrip("\r\n"))
+            if raw["type"] == "done":
+                # "(gdb)" prompt
+                self._ready.set()
+                continue
+            self._dispatch(
+                MiRecord(raw["type"], raw["message"], raw["payload"], raw.get("token"))
+            )
+        with self._cond:
+            for cmd in self._pending.values():
+                cmd.exited = True
+                cmd.done.set()
+            self._pending.clear()
+
+    def _dispatch(self, record: MiRecord):
+        with self._cond:
+            kind = record.kind
+            message = record.message
+            if message in MEMORY_INVALIDATING_RECORDS:
+                self._mem_cache.clear()
+            if message in BREAKPOINT_INVALIDATING_RECORDS:
+                self._bp_cache = None
+            if kind == "result":
+                cmd = self._pending.get(record.token)
+                if cmd is None:
+                    # Late answer to a command that already timed out.
+                    self._unsolicited.append(record)
+                    return
+                cmd.responses.append(record)
+                # Execution commands answer ^running right away; keep them
+                # open until the matching *stopped arrives.
+                if message == "running":
+                    cmd.running = True
+                else:
+                    self._finish(cmd)
+                return
+
+            if kind == "notify" and message == "stopped":
+                self._stops += 1
+                self._last_stop = record
+                self._cond.notify_all()
+                for cmd in self._pending.values():
+                    if cmd.running:
+                        cmd.responses.append(record)
+                        self._finish(cmd)
+                        return
+                # Nobody resumed the target (an interrupt after a timed-out
+                # continue, or the stop reported by "target remote").
+                self._unsolicited.append(record)
+                return
+
+            # Stream and async records carry no token. GDB handles commands
+            # in order, so they belong to the oldest command still waiting
+            # for its result.
+            for cmd in self._pending.values():
+                if not cmd.running:
+                    if cmd.on_record is not None and kind in STREAM_RECORD_TYPES:
+                        cmd.on_record(record)
+                    else:
+                        cmd.responses.append(record)
+                    return
+            self._unsolicited.append(record)
+
+    def _finish(self, cmd: _Command):
+        del self._pending[cmd.token]
+        cmd.done.set()
+
+    # (path, mtime_ns, port) of the last .gdb-port read. Keyed on mtime so a
+    # restarted QEMU that rewrites the file is picked up immediately.
+    _port_cache: tuple[Path, int, int | None] | None = None
+
+    @classmethod
+    def read_gdb_port(cls) -> int | None:
         root = find_project_root()
         if root is None:
             return None
+        path = root / GDB_PORT_FILE
         try:
-            return int((root / GDB_PORT_FILE).read_text().strip())
-        except (FileNotFoundError, ValueError):
+            mtime = os.stat(path).st_mtime_ns
+            cached = cls._port_cache
+            if cached is not None and cached[0] == path and cached[1] == mtime:
+                return cached[2]
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                data = os.read(fd, 32)
+            finally:
+                os.close(fd)
+        except FileNotFoundError:
             return None
+        try:
+            port = int(data.strip())
+        except ValueError:
+            port = None
+        cls._port_cache = (path, mtime, port)
+        return port
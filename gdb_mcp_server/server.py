@@ -1,101 +1,192 @@
+import asyncio
+import io
 import os
-import signal
+import struct
+import time
 
-from mcp.server.fastmcp import FastMCP
-from .gdb_session import GDBSession, DEFAULT_KERNEL_PATH, find_project_root
+from mcp.server.fastmcp import Context, FastMCP
+from pygdbmi.constants import GdbTimeoutError
+from .gdb_session import GDBSession, MiRecord, DEFAULT_KERNEL_PATH, find_project_root, mi_cstring
+
+STREAMED_OUTPUT_LIMIT = 256 * 1024
 
 mcp = FastMCP("gdb")
 session = GDBSession()
+# GDBSession blocks, so its calls run in worker threads. The lock keeps one
+# command sequence in flight at a time; interrupts deliberately skip it so
+# they can stop a gdb_continue that is still holding it.
+_session_lock = asyncio.Lock()
 
 
-class ToolTimeout(Exception):
-    pass
+async def _locked(func, *args, **kwargs):
+    async with _session_lock:
+        return await asyncio.to_thread(func, *args, **kwargs)
 
 
-def _with_timeout(func, timeout_sec):
-    def handler(signum, frame):
-        raise ToolTimeout(f"Timed out after {timeout_sec}s")
-    old = signal.signal(signal.SIGALRM, handler)
-    signal.alarm(timeout_sec)
-    try:
-        return func()
-    finally:
-        signal.alarm(0)
-        signal.signal(signal.SIGALRM, old)
+def _remaining(deadline: float, limit: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise GdbTimeoutError("Deadline exceeded")
+    return min(limit, remaining)
 
 
-def _format_responses(responses: list[dict]) -> str:
-    lines = []
-    for r in responses:
-        if r.get("type") == "console":
-            payload = r.get("payload", "")
-            if payload:
-                lines.append(payload)
-        elif r.get("type") == "result":
-            payload = r.get("payload")
-            if payload:
-                lines.append(str(payload))
-        elif r.get("type") == "notify":
-            msg = r.get("message", "")
-            payload = r.get("payload", {})
-            if msg:
-                lines.append(f"[{msg}] {payload}")
-    return "".join(lines) if lines else "OK"
-
-
-def _format_error(responses: list[dict]) -> str | None:
+def _format(responses: list[MiRecord]) -> tuple[str | None, str]:
+    err = None
+
+    def emit():
+        nonlocal err
+        for r in responses:
+            kind = r.kind
+            payload = r.payload
+            if err is None and r.message == "error":
+                err = (payload or {}).get("msg", str(payload))
+            if kind == "console":
+                if payload:
+                    yield payload
+            elif kind == "result":
+                if payload:
+                    yield str(payload)
+            elif kind == "notify":
+                if r.message:
+                    yield f"[{r.message}] {payload}"
+    text = "".join(emit()) or "OK"
+    return err, text
+
+
+def _format_responses(responses: list[MiRecord]) -> str:
+    return _format(responses)[1]
+
+
+def _format_error(responses: list[MiRecord]) -> str | None:
     for r in responses:
-        if r.get("message") == "error":
-            payload = r.get("payload", {})
-            msg = payload.get("msg", str(payload))
-            return msg
+        if r.message == "error":
+            return (r.payload or {}).get("msg", str(r.payload))
     return None
 
 
-def _run_mi(command: str, timeout_sec: int = 30) -> str:
-    def inner():
-        responses = session.execute_mi(command, timeout_sec=timeout_sec)
-        err = _format_error(responses)
-        if err:
-            return f"Error: {err}"
-        return _format_responses(responses)
-    return _with_timeout(inner, timeout_sec + 5)
+async def _run_mi(command: str, timeout_sec: int = 30) -> str:
+    try:
+        responses = await _locked(
+            session.execute_mi, command, timeout_sec=timeout_sec
+        )
+    except GdbTimeoutError:
+        return f"Error: timed out after {timeout_sec}s"
+    err, text = _format(responses)
+    return f"Error: {err}" if err else text
 
 
-def _run_cli(command: str, timeout_sec: int = 30) -> str:
+async def _run_cli(command: str, timeout_sec: int = 30) -> str:
+    try:
+        responses = await _locked(
+            session.execute_cli, command, timeout_sec=timeout_sec
+        )
+    except GdbTimeoutError:
+        return f"Error: timed out after {timeout_sec}s"
+    err, text = _format(responses)
+    return f"Error: {err}" if err else text
+
+
+async def _run_cli_streaming(command: str, ctx: Context | None, timeout_sec: int = 30) -> str:
+    # Console output is collected in the reader thread, up to
+    # STREAMED_OUTPUT_LIMIT, and each frame is reported as progress. Only the
+    # frame's first line is queued for that, and past the limit not even that,
+    # so a slow client cannot make the whole output pile up in the queue.
+    loop = asyncio.get_running_loop()
+    progress: asyncio.Queue[str | None] = asyncio.Queue()
+    out = io.StringIO()
+    received = 0
+
+    def on_record(record: MiRecord):
+        nonlocal received
+        chunk = record.payload
+        if record.kind != "console" or not chunk:
+            return
+        received += len(chunk)
+        room = STREAMED_OUTPUT_LIMIT - out.tell()
+        if room > 0:
+            out.write(chunk[:room])
+        if ctx is not None and chunk.startswith("#"):
+            message = chunk.split("\n", 1)[0] if room > 0 else ""
+            loop.call_soon_threadsafe(progress.put_nowait, message)
+
+    async def run():
+        try:
+            return await _locked(
+                session.execute_cli, command, timeout_sec=timeout_sec, on_record=on_record
+            )
+        finally:
+            # Queued behind every frame the reader thread has already posted.
+            loop.call_soon_threadsafe(progress.put_nowait, None)
+
+    task = asyncio.create_task(run())
+    frames = 0
+    while (message := await progress.get()) is not None:
+        frames += 1
+        await ctx.report_progress(frames, message=message or None)
+
+    try:
+        responses = await task
+    except GdbTimeoutError:
+        return f"Error: timed out after {timeout_sec}s"
+    err = _format_error(responses)
+    if err:
+        return f"Error: {err}"
+    text = out.getvalue()
+    if received > len(text):
+        text += f"\n... truncated ({received} characters in total)"
+    return text or "OK"
+
+
+async def _run_breakpoint_change(execute, command: str, timeout_sec: int = 30) -> str:
+    # The cached list is dropped once GDB has answered, under the same lock
+    # gdb_breakpoint_list holds while storing it, so a listing that overlaps
+    # the change cannot cache the old table.
     def inner():
-        responses = session.execute_cli(command, timeout_sec=timeout_sec)
-        err = _format_error(responses)
-        if err:
-            return f"Error: {err}"
-        return _format_responses(responses)
-    return _with_timeout(inner, timeout_sec + 5)
+        try:
+            return execute(command, timeout_sec=timeout_sec)
+        finally:
+            session.breakpoint_list = None
+
+    try:
+        responses = await _locked(inner)
+    except GdbTimeoutError:
+        return f"Error: timed out after {timeout_sec}s"
+    err, text = _format(responses)
+    return f"Error: {err}" if err else text
 
 
 @mcp.tool()
-def gdb_connect(
+async def gdb_connect(
     port: int | None = None,
     kernel_path: str = DEFAULT_KERNEL_PATH,
     gdb_path: str = "gdb",
 ) -> str:
     """Start GDB, load kernel symbols, and connect to QEMU.
     Reads port from .gdb-port if not specified."""
-    if session.connected:
-        return "Already connected. Use gdb_disconnect first."
-    if port is None:
-        port = session.read_gdb_port()
-        if port is None:
-            return "Error: No port specified and .gdb-port not found. Is QEMU running?"
-
     root = find_project_root()
     if root and not os.path.isabs(kernel_path):
         kernel_path = str(root / kernel_path)
 
-    def inner():
+    # Checked under the lock so a second, overlapping call cannot get past
+    # it and then tear down the session the first one just set up.
+    def inner(port):
+        if session.connected:
+            return "Already connected. Use gdb_disconnect first."
+        if port is None:
+            port = session.read_gdb_port()
+            if port is None:
+                return "Error: No port specified and .gdb-port not found. Is QEMU running?"
+
+        deadline = time.monotonic() + 30
         try:
             startup = session.start(gdb_path)
-            responses = session.connect_remote(port, kernel_path)
+            responses = session.connect_remote(
+                port, kernel_path, timeout_sec=_remaining(deadline, 30)
+            )
             all_responses = startup + responses
+        except GdbTimeoutError:
+            session.stop()
+            return "Error: gdb_connect timed out after 30s"
         except Exception as e:
             session.stop()
             return f"Error starting GDB: {e}"
@@ -107,162 +198,299 @@ def gdb_connect(
 
         return f"Connected to QEMU on port {port} with kernel {kernel_path}"
 
-    try:
-        return _with_timeout(inner, 30)
-    except ToolTimeout:
-        session.stop()
-        return "Error: gdb_connect timed out after 30s"
+    return await _locked(inner, port)
 
 
 @mcp.tool()
-def gdb_disconnect() -> str:
+async def gdb_disconnect() -> str:
     """Stop GDB session and clean up."""
-    session.stop()
+    await _locked(session.stop)
     return "Disconnected."
 
 
 @mcp.tool()
-def gdb_backtrace(full: bool = False) -> str:
+async def gdb_backtrace(full: bool = False, ctx: Context | None = None) -> str:
     """Get stack trace. Set full=True to include local variables."""
     if full:
-        return _run_cli("bt full")
-    return _run_mi("-stack-list-frames")
+        return await _run_cli_streaming("bt full", ctx)
+    return await _run_mi("-stack-list-frames")
 
 
 @mcp.tool()
-def gdb_breakpoint(location: str, hardware: bool = True) -> str:
+async def gdb_breakpoint(location: str, hardware: bool = True) -> str:
     """Set a breakpoint. Uses hardware breakpoints by default (reliable on RISC-V).
     Location can be function name, file:line, or address (*0x...)."""
     if hardware:
-        return _run_cli(f"hbreak {location}")
-    return _run_mi(f"-break-insert {location}")
+        return await _run_breakpoint_change(session.execute_cli, f"hbreak {location}")
+    return await _run_breakpoint_change(session.execute_mi, f"-break-insert {location}")
 
 
-@mcp.tool()
-def gdb_continue() -> str:
-    """Resume execution until breakpoint or signal."""
-    return _run_mi("-exec-continue", timeout_sec=60)
+# Tools that take no arguments and just run one MI command:
+# name -> (command, timeout_sec, description)
+_MI_TOOLS = {
+    "gdb_continue": ("-exec-continue", 60, "Resume execution until breakpoint or signal."),
+    "gdb_step": ("-exec-step", 30, "Step into next source line."),
+    "gdb_next": ("-exec-next", 30, "Step over next source line."),
+    "gdb_finish": ("-exec-finish", 60, "Run until the current function returns."),
+    "gdb_threads": ("-thread-info", 30, "List all threads/CPU harts."),
+}
 
 
-@mcp.tool()
-def gdb_step() -> str:
-    """Step into next source line."""
-    return _run_mi("-exec-step")
+def _mi_tool(name: str, command: str, timeout_sec: int):
+    async def tool() -> str:
+        return await _run_mi(command, timeout_sec=timeout_sec)
+    tool.__name__ = tool.__qualname__ = name
+    return tool
 
 
-@mcp.tool()
-def gdb_next() -> str:
-    """Step over next source line."""
-    return _run_mi("-exec-next")
+def _register_mi_tools():
+    for name, (command, timeout_sec, description) in _MI_TOOLS.items():
+        mcp.tool(name=name, description=description)(_mi_tool(name, command, timeout_sec))
+
+
+_register_mi_tools()
 
 
 @mcp.tool()
-def gdb_print(expression: str) -> str:
+async def gdb_print(expression: str) -> str:
     """Evaluate an expression (variable, register, memory dereference, etc.)."""
-    escaped = expression.replace('"', '\\"')
-    return _run_mi(f"-data-evaluate-expression \"{escaped}\"")
+    return await _run_mi("-data-evaluate-expression " + mi_cstring(expression))
 
 
 @mcp.tool()
-def gdb_execute(command: str, timeout_sec: int = 30) -> str:
+async def gdb_execute(command: str, timeout_sec: int = 30) -> str:
     """Run an arbitrary GDB CLI command. Escape hatch for anything not covered by other tools."""
-    return _run_cli(command, timeout_sec=timeout_sec)
+    return await _run_cli(command, timeout_sec=timeout_sec)
 
 
 @mcp.tool()
-def gdb_registers() -> str:
+async def gdb_registers() -> str:
     """Read all CPU registers."""
-    return _run_mi("-data-list-register-values x")
+    names = session.register_names
+    if not names:
+        return await _run_mi("-data-list-register-values x")
+
+    try:
+        responses = await _locked(session.execute_mi, "-data-list-register-values x")
+    except GdbTimeoutError:
+        return "Error: timed out after 30s"
+    err = _format_error(responses)
+    if err:
+        return f"Error: {err}"
+    values = []
+    for r in responses:
+        if r.kind == "result":
+            for v in (r.payload or {}).get("register-values", []):
+                number = int(v["number"])
+                name = names[number] if number < len(names) else ""
+                values.append(f"{name or number}={v['value']}")
+    return " ".join(values) or "OK"
 
 
 @mcp.tool()
-def gdb_locals(frame: int | None = None) -> str:
+async def gdb_locals(frame: int | None = None) -> str:
     """Get local variables in the current or specified stack frame."""
-    if frame is not None:
-        responses = session.execute_mi(f"-stack-select-frame {frame}")
-        err = _format_error(responses)
-        if err:
-            return f"Error selecting frame {frame}: {err}"
-    return _run_mi("-stack-list-locals --all-values")
+    if frame is None:
+        return await _run_mi("-stack-list-locals --all-values")
+    try:
+        select, responses = await _locked(
+            session.execute_batch,
+            [f"-stack-select-frame {frame}", "-stack-list-locals --all-values"],
+        )
+    except GdbTimeoutError:
+        return "Error: timed out after 30s"
+    err = _format_error(select)
+    if err:
+        return f"Error selecting frame {frame}: {err}"
+    err, text = _format(responses)
+    return f"Error: {err}" if err else text
+
+
+# unit -> (size in bytes, struct code, values per output row, like GDB's x)
+_MEMORY_UNITS = {"b": (1, "B", 8), "h": (2, "H", 8), "w": (4, "I", 4), "g": (8, "Q", 2)}
+_MEMORY_FORMATS = {
+    "x": lambda v, size: f"0x{v:0{size * 2}x}",
+    "d": lambda v, size: str(v),
+    "u": lambda v, size: str(v),
+    "o": lambda v, size: f"0{v:o}" if v else "0",
+    "t": lambda v, size: f"{v:0{size * 8}b}",
+}
+
+
+def _memory_blocks(responses: list[MiRecord]) -> list[tuple[int, bytes]]:
+    blocks = []
+    for r in responses:
+        if r.kind == "result":
+            for block in (r.payload or {}).get("memory", []):
+                start = int(block["begin"], 16)
+                blocks.append((start, bytes.fromhex(block["contents"])))
+    return blocks
+
+
+def _format_memory(blocks: list[tuple[int, bytes]], unit: str, fmt: str) -> str:
+    size, code, per_row = _MEMORY_UNITS[unit]
+    if fmt == "d":
+        code = code.lower()
+    format_value = _MEMORY_FORMATS[fmt]
+    lines = []
+    for start, data in blocks:
+        n = len(data) // size
+        values = struct.unpack(f"<{n}{code}", data[: n * size])
+        for row in range(0, n, per_row):
+            cells = "\t".join(format_value(v, size) for v in values[row : row + per_row])
+            lines.append(f"0x{start + row * size:x}:\t{cells}")
+    return "\n".join(lines) or "OK"
 
 
 @mcp.tool()
-def gdb_examine(address: str, count: int = 16, unit: str = "g", fmt: str = "x") -> str:
+async def gdb_examine(address: str, count: int = 16, unit: str = "g", fmt: str = "x") -> str:
     """Examine memory. Default: 16 giant words (8 bytes each) in hex. Common units: b=1, h=2, w=4, g=8."""
-    return _run_cli(f"x/{count}{fmt}{unit} {address}")
+    if unit not in _MEMORY_UNITS or fmt not in _MEMORY_FORMATS:
+        # Instructions, strings, floats etc. need GDB's own formatting.
+        key = (address, count, unit, fmt)
+        cached = session.memory_cache_get(key)
+        if cached is not None:
+            return cached
+        text = await _run_cli(f"x/{count}{fmt}{unit} {address}")
+        if not text.startswith("Error"):
+            session.memory_cache_put(key, text)
+        return text
+
+    size = count * _MEMORY_UNITS[unit][0]
+    key = (address, size)
+    blocks = session.memory_cache_get(key)
+    if blocks is None:
+        try:
+            responses = await _locked(
+                session.execute_mi, f"-data-read-memory-bytes {mi_cstring(address)} {size}"
+            )
+        except GdbTimeoutError:
+            return "Error: timed out after 30s"
+        err = _format_error(responses)
+        if err:
+            return f"Error: {err}"
+        blocks = _memory_blocks(responses)
+        session.memory_cache_put(key, blocks)
+    return _format_memory(blocks, unit, fmt)
 
 
-@mcp.tool()
-def gdb_breakpoint_list() -> str:
-    """List all breakpoints with status and hit counts."""
-    return _run_mi("-break-list")
+def _breakpoint_where(bp: dict) -> str:
+    if bp.get("func") and bp.get("file"):
+        return f"{bp['func']} at {bp['file']}:{bp.get('line', '?')}"
+    # Watchpoints and catchpoints name what they watch in "what".
+    return bp.get("func") or bp.get("what") or bp.get("original-location", "")
 
 
-@mcp.tool()
-def gdb_breakpoint_delete(number: int) -> str:
-    """Delete a breakpoint by its number."""
-    return _run_mi(f"-break-delete {number}")
+def _format_breakpoints(responses: list[MiRecord]) -> str:
+    lines = []
+    for r in responses:
+        if r.kind == "result":
+            table = (r.payload or {}).get("BreakpointTable", {})
+            for bp in table.get("body", []):
+                line = (
+                    f"{bp.get('number')}\t{bp.get('type')}\tenabled={bp.get('enabled')}"
+                    f"\t{bp.get('addr', '')}\t{_breakpoint_where(bp)}"
+                    f"\thits={bp.get('times', '0')}"
+                )
+                if bp.get("cond"):
+                    line += f"\tif {bp['cond']}"
+                lines.append(line)
+                # A breakpoint with several locations (addr="<MULTIPLE>")
+                # lists them separately under mi3.
+                for loc in bp.get("locations", []):
+                    lines.append(
+                        f"{loc.get('number')}\tlocation\tenabled={loc.get('enabled')}"
+                        f"\t{loc.get('addr', '')}\t{_breakpoint_where(loc)}"
+                    )
+    return "\n".join(lines) or "No breakpoints."
 
 
 @mcp.tool()
-def gdb_interrupt() -> str:
-    """Pause the running kernel by sending SIGINT to GDB."""
-    session.interrupt()
+async def gdb_breakpoint_list() -> str:
+    """List all breakpoints with status and hit counts."""
+    cached = session.breakpoint_list
+    if cached is not None:
+        return cached
+
+    def inner():
+        # Checked again under the lock: a change that finished while we
+        # waited for it has already dropped the cache.
+        cached = session.breakpoint_list
+        if cached is not None:
+            return cached
+        responses = session.execute_mi("-break-list")
+        err = _format_error(responses)
+        if err:
+            return f"Error: {err}"
+        text = _format_breakpoints(responses)
+        session.breakpoint_list = text
+        return text
+
     try:
-        responses = session._require_gdb().get_gdb_response(timeout_sec=5)
-        output = _format_responses(responses)
-        if output and output != "OK":
-            return f"Interrupted. {output}"
-        return "Interrupted."
-    except Exception:
-        return "Interrupt sent (no stop response received)."
+        return await _locked(inner)
+    except GdbTimeoutError:
+        return "Error: timed out after 30s"
 
 
 @mcp.tool()
-def gdb_finish() -> str:
-    """Run until the current function returns."""
-    return _run_mi("-exec-finish", timeout_sec=60)
+async def gdb_breakpoint_delete(number: int) -> str:
+    """Delete a breakpoint by its number."""
+    return await _run_breakpoint_change(session.execute_mi, f"-break-delete {number}")
 
 
 @mcp.tool()
-def gdb_threads() -> str:
-    """List all threads/CPU harts."""
-    return _run_mi("-thread-info")
+async def gdb_interrupt() -> str:
+    """Pause the running kernel by sending SIGINT to GDB."""
+    responses = await asyncio.to_thread(session.interrupt, timeout_sec=5)
+    if not responses:
+        return "Interrupt sent (no stop response received)."
+    return f"Interrupted. {_format_responses(responses)}"
 
 
 @mcp.tool()
-def gdb_select_thread(thread_id: int) -> str:
+async def gdb_select_thread(thread_id: int) -> str:
     """Switch to a different thread/hart."""
-    return _run_mi(f"-thread-select {thread_id}")
+    return await _run_mi(f"-thread-select {thread_id}")
 
 
 @mcp.tool()
-def gdb_frame(frame_number: int) -> str:
+async def gdb_frame(frame_number: int) -> str:
     """Select a stack frame for inspection."""
-    responses = session.execute_mi(f"-stack-select-frame {frame_number}")
-    err = _format_error(responses)
+    # Selecting has to stick for later gdb_print/gdb_locals calls, so this is
+    # not -stack-info-frame --frame N; both commands just share one write.
+    try:
+        select, responses = await _locked(
+            session.execute_batch,
+            [f"-stack-select-frame {frame_number}", "-stack-info-frame"],
+        )
+    except GdbTimeoutError:
+        return "Error: timed out after 30s"
+    err = _format_error(select)
     if err:
         return f"Error: {err}"
-    return _run_mi("-stack-info-frame")
+    err, text = _format(responses)
+    return f"Error: {err}" if err else text
+
+
+def _split_thread_backtraces(text: str) -> list[str]:
+    sections = []
+    for section in ("\n" + text).split("\nThread ")[1:]:
+        header, _, bt = section.partition("\n")
+        tid = header.split(" ", 1)[0]
+        sections.append(f"--- Thread {tid} ---\n{bt}")
+    return sections
 
 
 @mcp.tool()
-def gdb_diagnose() -> str:
+async def gdb_diagnose() -> str:
     """One-shot diagnostic: interrupt kernel, list all threads, get backtrace for each.
     Returns a combined report useful for diagnosing deadlocks and hangs."""
-    def inner():
-        parts = []
+    deadline = time.monotonic() + 60
 
-        session.interrupt()
-        try:
-            responses = session._require_gdb().get_gdb_response(timeout_sec=5)
-            stop_info = _format_responses(responses)
-            if stop_info and stop_info != "OK":
-                parts.append(f"Stop reason: {stop_info}")
-        except Exception:
-            parts.append("Interrupt sent (no stop response received)")
-
-        thread_responses = session.execute_mi("-thread-info", timeout_sec=10)
+    def inner(parts):
+        thread_responses = session.execute_mi(
+            "-thread-info", timeout_sec=_remaining(deadline, 10)
+        )
         err = _format_error(thread_responses)
         if err:
             parts.append(f"Thread list error: {err}")
@@ -270,9 +498,8 @@ def gdb_diagnose() -> str:
 
         thread_ids = []
         for r in thread_responses:
-            if r.get("type") == "result":
-                payload = r.get("payload", {})
-                threads = payload.get("threads", [])
+            if r.kind == "result":
+                threads = (r.payload or {}).get("threads", [])
                 for t in threads:
                     tid = t.get("id")
                     if tid:
@@ -280,20 +507,46 @@ def gdb_diagnose() -> str:
 
         parts.append(f"Threads: {len(thread_ids)}")
 
+        # One round-trip for every hart; only walk them one by one if GDB
+        # refuses the bulk command.
+        bt_responses = session.execute_cli(
+            "thread apply all bt", timeout_sec=_remaining(deadline, 30)
+        )
+        bt_err, bt_text = _format(bt_responses)
+        if bt_err is None:
+            sections = _split_thread_backtraces(bt_text)
+            if sections:
+                parts.extend(sections)
+                return "\n\n".join(parts)
+
         for tid in thread_ids:
-            select_responses = session.execute_mi(f"-thread-select {tid}", timeout_sec=5)
+            select_responses = session.execute_mi(
+                f"-thread-select {tid}", timeout_sec=_remaining(deadline, 5)
+            )
             select_err = _format_error(select_responses)
             if select_err:
                 parts.append(f"--- Thread {tid} ---\nError selecting thread: {select_err}")
                 continue
-            bt_responses = session.execute_cli("bt", timeout_sec=10)
-            bt_err = _format_error(bt_responses)
-            bt_text = f"Error: {bt_err}" if bt_err else _format_responses(bt_responses)
+            bt_responses = session.execute_cli(
+                "bt", timeout_sec=_remaining(deadline, 10)
+            )
+            bt_err, bt_text = _format(bt_responses)
+            if bt_err:
+                bt_text = f"Error: {bt_err}"
             parts.append(f"--- Thread {tid} ---\n{bt_text}")
 
         return "\n\n".join(parts)
 
     try:
-        return _with_timeout(inner, 60)
-    except ToolTimeout:
+        # Interrupt outside the lock so a pending gdb_continue gets its
+        # *stopped record and lets go of the session.
+        responses = await asyncio.to_thread(
+            session.interrupt, timeout_sec=_remaining(deadline, 5)
+        )
+        if responses:
+            parts = [f"Stop reason: {_format_responses(responses)}"]
+        else:
+            parts = ["Interrupt sent (no stop response received)"]
+        return await _locked(inner, parts)
+    except GdbTimeoutError:
         return "Error: gdb_diagnose timed out after 60s"